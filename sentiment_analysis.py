@@ -15,26 +15,303 @@ This is why I've taken the menu screen approach, rather than running sentiment
 analysis for the entire DataFrame and exporting this data for visualisation.
 """
 
+import os
+import bisect
+import functools
+from typing import NamedTuple
+
 import spacy
+import joblib
+from spacy.attrs import LEMMA, IS_STOP, IS_PUNCT, IS_SPACE
+from spacy.util import get_package_version
+import numpy as np
 import pandas as pd
-from textblob import TextBlob
+from textblob.en.sentiments import PatternAnalyzer
+
+# Dataset location and the on-disk cache for its cleaned tokens and vectors
+FILE_PATH = 'amazon_product_reviews.csv'
+memory = joblib.Memory('.cache', mmap_mode='r', verbose=0)
+
+# Part of every cache key, as joblib only tracks the cached function's code
+# Bump whenever cleaning, tokenizing or scoring the reviews changes
+PREPROCESSING_VERSION = 1
+
+# Lower bounds of the description bands, shared by polarity and similarity
+THRESHOLDS = (-0.800, -0.400, -0.100, 0.100, 0.400, 0.800)
+POLARITY_LABELS = (
+    "Extremely negative", "Very negative", "Somewhat negative", "Neutral",
+    "Somewhat positive", "Very positive", "Extremely positive"
+)
+SIMILARITY_LABELS = (
+    "Extremely dissimilar", "Very dissimilar", "Somewhat dissimilar",
+    "Neutral", "Somewhat similar", "Very similar", "Extremely similar"
+)
+
+# Rows of the int8 review vectors widened to int32 at once when ranking
+SCORE_CHUNK = 4096
 
 # Load a small-sized langauge model for polarity analysis
-nlp_sm = spacy.load('en_core_web_sm')
+# Only the lemmatizer and the components it relies on for POS are kept
+nlp_sm = spacy.load('en_core_web_sm', exclude=['parser', 'ner', 'senter'])
+
+# Most worker processes used to tokenize the corpus, each a copy of the model
+MAX_PROCESSES = 4
+
+@functools.lru_cache(maxsize=1)
+def get_nlp_md() -> spacy.language.Language:
+    """
+    Loads the medium-sized language model for similarity analysis on first
+    use, so sessions that never compare reviews skip loading it.
+    Similarity only needs the static word vectors, so every component is
+    dropped.
+
+    Parameters:
+    - None.
+
+    Returns:
+    - Language: The medium-sized language model.
+    """
+    return spacy.load(
+        'en_core_web_md',
+        exclude=[
+            'tok2vec', 'tagger', 'parser', 'attribute_ruler', 'lemmatizer',
+            'ner', 'senter'
+        ]
+    )
+
+def clean_doc(doc: spacy.tokens.Doc) -> str:
+    """
+    Lemmatizes and filters a processed review to produce a clean list of
+    relevant words.
+    Joins the list into a str for further NLP processing.
+
+    Parameters:
+    - doc (Doc): A review already processed by the small model.
+
+    Returns:
+    - str: A string comprised of cleaned lemmas.
+    """
+    # Read the needed attributes of every token into one array at once
+    lemma, is_stop, is_punct, is_space = doc.to_array(
+        [LEMMA, IS_STOP, IS_PUNCT, IS_SPACE]
+    ).T
+
+    keep = (
+        (is_stop == 0)                          # Remove stop words
+        & ((is_punct == 0) | (is_space == 1))   # Remove punct and whitespace
+    )
+
+    # Look up the lemma strings of the kept tokens and make them lowercase
+    strings = doc.vocab.strings
+    tokens = [strings[key].lower() for key in lemma[keep].tolist()]
+
+    # Join to str
+    return ' '.join(tokens)
+
+def tokenize_reviews(texts: list) -> list:
+    """
+    Runs every review through the small model in batches and cleans each one.
+    Batching with nlp.pipe is much faster than processing reviews one by one,
+    and the batches are shared between worker processes.
+    Each review carries its index through the pipeline, so its cleaned lemmas
+    land in the right place whatever order the documents come back in.
+
+    Parameters:
+    - texts (list[str]): All review texts, in index order.
+
+    Calls:
+    - clean_doc(): Lemmatizes and filters a processed review.
+
+    Returns:
+    - list[str]: Cleaned lemma strings, indexed like the input texts.
+    """
+    # Spread the model across all but one CPU core, up to MAX_PROCESSES
+    processes = min(MAX_PROCESSES, max(1, (os.cpu_count() or 1) - 1))
+    docs = nlp_sm.pipe(
+        ((text, index) for index, text in enumerate(texts)),
+        as_tuples=True,
+        batch_size=500,
+        n_process=processes
+    )
+
+    # Write each cleaned review back to the index it came in with
+    tokens = [None] * len(texts)
+    for doc, index in docs:
+        tokens[index] = clean_doc(doc)
+
+    return tokens
+
+def score_reviews(tokens: list) -> np.ndarray:
+    """
+    Calculates the polarity of every review from its cleaned tokens, once,
+    so lookups during the session are instant.
+    One PatternAnalyzer, the analyzer TextBlob uses by default, scores every
+    review, skipping the TextBlob built around each one.
+
+    Parameters:
+    - tokens (list[str]): Cleaned lemma strings of every review.
+
+    Returns:
+    - np.ndarray: The polarity value of every review, indexed like the input
+      tokens.
+    """
+    analyzer = PatternAnalyzer()
+    return np.array(
+        [analyzer.analyze(review).polarity for review in tokens],
+        dtype=np.float64
+    )
+
+@memory.cache
+def load_corpus(
+    file_path: str,
+    csv_mtime: float,
+    sm_version: str,
+    preprocessing_version: int
+) -> tuple:
+    """
+    Reads the reviews from the .csv file and cleans, tokenizes and scores
+    every one.
+    Results are cached on disk by joblib, so later runs with the same .csv
+    file, small model and preprocessing skip straight to loading them.
+
+    Parameters:
+    - file_path (str): The location of the .csv file.
+    - csv_mtime (float): When the .csv file was last modified, to key the
+      cache.
+    - sm_version (str): The small model's version, to key the cache.
+    - preprocessing_version (int): PREPROCESSING_VERSION, to key the cache.
+
+    Calls:
+    - tokenize_reviews(): Cleans every review.
+    - score_reviews(): Scores every review.
+
+    Returns:
+    - tuple[np.ndarray, list[str], np.ndarray]: The review texts, their
+      cleaned lemma strings and their polarity values, all in the same order.
+    """
+    # Read only the reviews.text column of the .csv file into a DataFrame
+    # The C parser handles the line breaks inside quoted product names
+    df = pd.read_csv(file_path, engine='c', usecols=['reviews.text'])
+
+    # Drop missing reviews and store the rest into a series for processing
+    # Reset the index so positions line up with the tokens
+    reviews_data = df['reviews.text'].dropna().reset_index(drop=True)
+
+    # Keep a plain array of the reviews for constant-time positional lookups
+    reviews_list = reviews_data.to_numpy()
+
+    tokens = tokenize_reviews(reviews_data.tolist())
+    return reviews_list, tokens, score_reviews(tokens)
+
+def quantize_vectors(vectors: np.ndarray) -> tuple:
+    """
+    Stores review vectors as int8 with a single scale for the whole matrix,
+    using a quarter of the memory of float32.
+    The rounding error is around 1e-3, well inside the 0.1-wide bands used by
+    similarity_description().
+
+    Parameters:
+    - vectors (np.ndarray): A float32 matrix with one unit row per review.
+
+    Returns:
+    - tuple[np.ndarray, float]: The int8 matrix, and the factor it was
+      scaled by.
+    """
+    scale = 127.0 / max(float(np.max(np.abs(vectors))), 1e-12)
+    return np.round(vectors * scale).astype(np.int8), scale
+
+@memory.cache
+def load_vectors(
+    file_path: str,
+    csv_mtime: float,
+    sm_version: str,
+    preprocessing_version: int,
+    md_version: str
+) -> tuple:
+    """
+    Builds the unit-length mean word vector of every review, stored as int8.
+    Results are cached on disk by joblib and memory-mapped when loaded, so
+    rows are only read when used.
+
+    Used for similarity, as the cosine of two unit vectors is their dot
+    product.
+
+    Parameters:
+    - file_path (str): The location of the .csv file.
+    - csv_mtime (float): When the .csv file was last modified, to key the
+      cache.
+    - sm_version (str): The small model's version the tokens were built
+      with, to key the cache.
+    - preprocessing_version (int): PREPROCESSING_VERSION, to key the cache.
+    - md_version (str): The medium model's version, to key the cache.
+
+    Calls:
+    - load_corpus(): Loads the cleaned tokens of every review.
+    - get_nlp_md(): Loads the medium model.
+    - quantize_vectors(): Converts the vectors to int8.
+
+    Returns:
+    - tuple[np.ndarray, float]: The int8 matrix with one row per review, and
+      the factor it was scaled by.
+    """
+    _, tokens, _ = load_corpus(
+        file_path, csv_mtime, sm_version, preprocessing_version
+    )
+
+    # Average word vectors per review using the medium model
+    docs = get_nlp_md().pipe(tokens, batch_size=500)
+    vectors = np.stack([doc.vector for doc in docs]).astype(np.float32)
+
+    # Normalise rows, leaving reviews without known words as zero vectors
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
 
-# Load a medium-sized langauge model for similarity analysis
-nlp_md = spacy.load('en_core_web_md')
+    return quantize_vectors(vectors)
+
+def corpus_key() -> tuple:
+    """
+    Collects everything the preprocessed reviews depend on, to key the
+    caches of load_corpus() and load_vectors().
+
+    Parameters:
+    - None.
 
+    Returns:
+    - tuple[str, float, str, int]: The .csv file's location and modified
+      time, the small model's version, and PREPROCESSING_VERSION.
+    """
+    return (
+        FILE_PATH,
+        os.path.getmtime(FILE_PATH),
+        get_package_version('en_core_web_sm'),
+        PREPROCESSING_VERSION
+    )
 
-# Read the .csv file and store into a Pandas DataFrame
-df = pd.read_csv('amazon_product_reviews.csv')
+class Corpus(NamedTuple):
+    """The preprocessed reviews, all indexed by review position."""
+    reviews: np.ndarray     # Original review texts
+    tokens: list            # Cleaned lemma strings
+    polarities: np.ndarray  # Polarity values
+    size: int               # Number of reviews
 
-# Drop rows with missing values in the 'reviews.text' column
-clean_data = df.dropna(subset=['reviews.text'])
+@functools.lru_cache(maxsize=1)
+def load_data() -> Corpus:
+    """
+    Loads every review and cleans, tokenizes and scores it on first use.
+    No corpus work happens at import, so tokenizer worker processes, which
+    re-import this module on spawn-based platforms, don't redo it.
 
-# Isolate and store the reviews.text column into a series for processing
-reviews_data = clean_data['reviews.text']
+    Parameters:
+    - None.
 
+    Calls:
+    - corpus_key(): Collects the cache key.
+    - load_corpus(): Loads or builds the preprocessed reviews.
+
+    Returns:
+    - Corpus: The preprocessed reviews.
+    """
+    reviews, tokens, polarities = load_corpus(*corpus_key())
+    return Corpus(reviews, tokens, polarities, len(reviews))
 
 def get_int(display_string: str) -> int:
     """
@@ -47,17 +324,17 @@ def get_int(display_string: str) -> int:
     - int: A valid integer
     """
     # Continuously prompt the user until a valid integer is entered.
+    # Checking the digits directly avoids raising ValueError on bad input
     while True:
-        user_input = input(display_string)
-        try:
-            user_input = int(user_input)
-            return user_input
-        except ValueError:
-            print("<<< Please enter an integer >>>")
+        user_input = input(display_string).strip()
+        digits = user_input[1:] if user_input[:1] in ('-', '+') else user_input
+        if digits.isdecimal():
+            return int(user_input)
+        print("<<< Please enter an integer >>>")
 
-def find_review(display_string: str) -> str:
+def select_index(display_string: str) -> int:
     """
-    Uses user-input index to retrieve and return review text from a list.
+    Asks the user for the index of a review until one in bounds is entered.
 
     Parameters:
     - display_string (input[str]): Prompts user to choose an index.
@@ -66,46 +343,127 @@ def find_review(display_string: str) -> str:
     - get_int(): Ensures user input is a valid int.
 
     Returns:
-    - str: The review located at the chosen index.
+    - int: The user-selected review index.
     """
+    size = load_data().size
     while True:
         index = get_int(display_string)     # Prompt user to select index
-        if index <= len(reviews_data):
-            review = reviews_data[index]    # Locate user-selected review
-            return review
+        if 0 <= index < size:
+            return index
         else:                               # Ensure input is in bounds
-            print(f"<<< Max index: {len(reviews_data)} >>>")
+            print(f"<<< Max index: {size - 1} >>>")
 
-def filter_and_tokenize(text: str) -> str:
+def find_review(index: int) -> str:
     """
-    Converts string to an NLP object using the small model.
-    Tokenizes, lemmatizes and filters text to produce a clean list of relevant
-    words.
-    Joins the list into a str for further NLP processing.
+    Retrieves and returns review text from the array of reviews.
 
     Parameters:
-    - text (str): A string comprising review text to be processed.
+    - index (int): The index of the review.
+
+    Returns:
+    - str: The review located at the chosen index.
+    """
+    return load_data().reviews[index]
+
+def filter_and_tokenize(index: int) -> str:
+    """
+    Looks up the cleaned lemmas of a review, prepared by load_data().
+
+    Parameters:
+    - index (int): The index of the review.
 
     Returns:
     - str: A string comprised of cleaned lemmas.
     """
-    # Make text an nlp object using the small model
-    sentence = nlp_sm(text)
+    return load_data().tokens[index]
+
+def review_polarity(index: int) -> float:
+    """
+    Looks up the polarity of a review, calculated from its cleaned tokens by
+    load_data().
 
-    tokens = [
-        token.lemma_ for token in sentence       # Tokenize and lemmatize
-        if not token.is_stop                     # Remove stop words
-        if not token.is_punct or token.is_space  # Remove punct and whitespace
-    ]
+    Parameters:
+    - index (int): The index of the review.
 
-    # Join to str and make lowercase
-    return ' '.join(tokens).lower()
+    Returns:
+    - float: A float between -1.000 and 1.000.
+    """
+    return float(load_data().polarities[index])
+
+@functools.lru_cache(maxsize=1)
+def get_review_vectors() -> tuple:
+    """
+    Loads the normalised review vectors used for similarity, stored as int8,
+    on first use.
+
+    Parameters:
+    - None.
+
+    Calls:
+    - corpus_key(): Collects the cache key.
+    - load_vectors(): Loads or builds the int8 review vectors.
+
+    Returns:
+    - tuple[np.ndarray, float]: The int8 matrix, and the factor it was
+      scaled by.
+    """
+    return load_vectors(*corpus_key(), get_package_version('en_core_web_md'))
+
+def review_similarity(index_1: int, index_2: int) -> float:
+    """
+    Calculates the cosine similarity of two reviews from their precomputed
+    unit vectors.
+
+    Parameters:
+    - index_1 (int): The index of the first review.
+    - index_2 (int): The index of the second review.
+
+    Calls:
+    - get_review_vectors(): Loads the review vectors on first use.
+
+    Returns:
+    - float: A float between -1.000 and 1.000.
+    """
+    # Accumulate in int32, then undo the quantization scale on both vectors
+    review_vectors, vector_scale = get_review_vectors()
+    vector_1 = review_vectors[index_1].astype(np.int32)
+    vector_2 = review_vectors[index_2].astype(np.int32)
+    return float(vector_1 @ vector_2) / vector_scale ** 2
+
+def top_k_similar(index: int, k: int = 10) -> np.ndarray:
+    """
+    Finds the reviews most similar to a given review.
+    Scores every review with matrix-vector products over blocks of rows.
+
+    Parameters:
+    - index (int): The index of the review to compare against.
+    - k (int): The number of similar reviews to return.
+
+    Returns:
+    - np.ndarray: Indexes of the k most similar reviews, most similar first.
+    """
+    if k <= 0:
+        raise ValueError(f"k must be a positive integer, got {k}")
+
+    review_vectors, _ = get_review_vectors()
+
+    # Accumulate in int32, as the int8 products would overflow
+    # Widen a block of rows at a time, never a full int32 copy of the matrix
+    query = review_vectors[index].astype(np.int32)
+    scores = np.empty(len(review_vectors), dtype=np.float32)
+    for start in range(0, len(review_vectors), SCORE_CHUNK):
+        block = review_vectors[start:start + SCORE_CHUNK].astype(np.int32)
+        scores[start:start + SCORE_CHUNK] = block @ query
+    scores[index] = -np.inf                 # Exclude the review itself
+
+    # Partially sort for the top k, then order only those k
+    k = min(k, len(scores) - 1)
+    top = np.argpartition(-scores, k)[:k]
+    return top[np.argsort(-scores[top])]
 
 def print_max_index() -> print:
     """Prints the number of indexes in DataFrame"""
-    print(
-        f"There are {len(reviews_data)} reviews in the DataFrame."
-    )
+    print(f"There are {load_data().size} reviews in the DataFrame.")
 
 def polarity_description(polarity_value: float) -> str:
     """
@@ -118,22 +476,8 @@ def polarity_description(polarity_value: float) -> str:
     Returns:
     - description (str): A string comprising the textual description.
     """
-    # Assign description for polarity value
-    if polarity_value >= 0.800:
-        description = "Extremely positive"
-    elif polarity_value >= 0.400:
-        description = "Very positive"
-    elif polarity_value >= 0.100:
-        description = "Somewhat positive"
-    elif polarity_value >= -0.100:
-        description = "Neutral"
-    elif polarity_value >= -0.400:
-        description = "Somewhat negative"
-    elif polarity_value >= -0.800:
-        description = "Very negative"
-    elif polarity_value >= -1.000:
-        description = "Extremely negative"
-    return description
+    # Find the band the value falls in, each threshold starting a new band
+    return POLARITY_LABELS[bisect.bisect_right(THRESHOLDS, polarity_value)]
 
 def similarity_description(similarity_value: float) -> str:
     """
@@ -146,22 +490,8 @@ def similarity_description(similarity_value: float) -> str:
     Returns:
     - description (str): A string comprising the textual description.
     """
-    # Assign description for similarity value
-    if similarity_value >= 0.800:
-        description = "Extremely similar"
-    elif similarity_value >= 0.400:
-        description = "Very similar"
-    elif similarity_value >= 0.100:
-        description = "Somewhat similar"
-    elif similarity_value >= -0.100:
-        description = "Neutral"
-    elif similarity_value >= -0.400:
-        description = "Somewhat dissimilar"
-    elif similarity_value >= -0.800:
-        description = "Very dissimilar"
-    elif similarity_value >= -1.000:
-        description = "Extremely dissimilar"
-    return description
+    # Find the band the value falls in, each threshold starting a new band
+    return SIMILARITY_LABELS[bisect.bisect_right(THRESHOLDS, similarity_value)]
 
 def get_polarity(display_string: str) -> print:
     """
@@ -173,17 +503,19 @@ def get_polarity(display_string: str) -> print:
     - display_string (str): Prompts user to choose a review by index.
 
     Calls:
+    - select_index(): Asks the user to choose a review.
     - find_review(): Locates and returns user-chosen review.
-    - filter_and_tokenize(): Tokenizes and cleans a given review text.
+    - filter_and_tokenize(): Looks up the cleaned tokens of a review.
+    - review_polarity(): Looks up the polarity of a review.
     - polarity_description(): Assigns a textual score to the polarity value.
 
     Returns:
     - None.
     """
-    text = find_review(display_string)      # Locate user-selected review
-    tokens = filter_and_tokenize(text)      # Clean and tokenize text
-    text_blob = TextBlob(tokens)            # Convert text to TextBlob object
-    value = text_blob.polarity              # Calculate polarity
+    index = select_index(display_string)    # Choose a review
+    text = find_review(index)               # Locate user-selected review
+    tokens = filter_and_tokenize(index)     # Look up cleaned tokens
+    value = review_polarity(index)          # Look up polarity
     description = polarity_description(value) # Give value a textual score
 
     # Summarise and display all information for assessment
@@ -204,27 +536,24 @@ def get_similarity(display_string: str) -> print:
     - display_string (str): Prompts user to choose two reviews by index.
 
     Calls:
-    - find_review(): Locates and returns user-chosen review.
-    - filter_and_tokenize(): Tokenizes and cleans a given review text.
+    - select_index(): Asks the user to choose a review.
+    - filter_and_tokenize(): Looks up the cleaned tokens of a review.
+    - review_similarity(): Calculates the similarity of two reviews.
     - similarity_description(): Assigns textual score to similarity value.
 
     Returns:
     - None.
     """
-    # Locate user-selected reviews
-    text_1 = find_review(display_string)
-    text_2 = find_review(display_string)
+    # Choose two reviews
+    index_1 = select_index(display_string)
+    index_2 = select_index(display_string)
 
-    # Tokenize and clean text
-    tokens_1 = filter_and_tokenize(text_1)
-    tokens_2 = filter_and_tokenize(text_2)
-
-    # Convert to nlp objects using the medium model
-    nlp_review_1 = nlp_md(tokens_1)
-    nlp_review_2 = nlp_md(tokens_2)
+    # Look up cleaned tokens
+    tokens_1 = filter_and_tokenize(index_1)
+    tokens_2 = filter_and_tokenize(index_2)
 
     # Calculate similarity value and assign description
-    value = nlp_review_1.similarity(nlp_review_2)
+    value = review_similarity(index_1, index_2)
     description = similarity_description(value)
 
     # Summarise and display all information for assessment
@@ -269,9 +598,10 @@ def display_review_polarity():
     Returns:
     - None.
     """
+    size = load_data().size
     while True:
         get_polarity(
-            f"Select an index up to {len(reviews_data)} "
+            f"Select an index up to {size - 1} "
             "for polarity analysis: "
         )
         user_input = input(
@@ -295,9 +625,10 @@ def display_reviews_similarity():
     Returns:
     - None
     """
+    size = load_data().size
     while True:
         get_similarity(
-            f"Select an index up to {len(reviews_data)} "
+            f"Select an index up to {size - 1} "
             "for similarity analysis: "
         )
         user_input = input(
@@ -318,12 +649,16 @@ def main():
     - None.
 
     Calls:
+    - load_data(): Loads the preprocessed reviews before the menu is shown.
     - display_review_polarity(): Displays polarity score of a selected review.
     - display_reviews_similarity(): Displays similarity value of two reviews.
 
     Returns:
     - None
     """
+    # Load every review and clean, tokenize and score it once, up front
+    load_data()
+
     option_choice = 0
 
     # Run options screen